@@ -1,18 +1,51 @@
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, Response, request, jsonify, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime
+from werkzeug.datastructures import Headers
+from sqlalchemy import event, func, insert, select
+from sqlalchemy.orm import selectinload
+from dateutil import parser as date_parser
+from collections import defaultdict
+from datetime import date, datetime
+from functools import lru_cache
+import codecs
+import csv
+import orjson
 import os
-import pandas as pd
-from io import StringIO, BytesIO
+import unicodedata
+from io import StringIO
+from urllib.parse import quote
+
+class ORJSONProvider(DefaultJSONProvider):
+    """JSON provider backed by orjson, which encodes dates and datetimes natively"""
+    
+    def dumps(self, obj, *, indent=None, sort_keys=None, separators=None):
+        # orjson output is always compact unless indented, and only indents by two spaces
+        if sort_keys is None:
+            sort_keys = self.sort_keys
+        option = orjson.OPT_SORT_KEYS if sort_keys else 0
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self.default, option=option).decode()
+    
+    def loads(self, s, **kwargs):
+        # orjson.loads takes no options; stdlib json.loads keywords have no equivalent
+        return orjson.loads(s)
 
 app = Flask(__name__)
+app.json = ORJSONProvider(app)
 CORS(app)
 
 # Database configuration
 basedir = os.path.abspath(os.path.dirname(__file__))
 app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{os.path.join(basedir, "job_tracker.db")}'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# Wait on a locked database instead of failing; pool sizing is left to Flask-SQLAlchemy,
+# which uses StaticPool for in-memory databases
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+    'connect_args': {'timeout': 30},
+}
 
 db = SQLAlchemy(app)
 
@@ -20,24 +53,33 @@ db = SQLAlchemy(app)
 class Project(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    companies = db.relationship('Company', backref='project', lazy=True, cascade='all, delete-orphan')
+    # Timestamp filled in by SQLite; the inline default also covers tables created
+    # before the server default existed, since create_all never alters a table
+    created_at = db.Column(db.DateTime, default=db.func.current_timestamp(),
+                           server_default=db.func.current_timestamp(), nullable=False)
+    companies = db.relationship('Company', back_populates='project', lazy=True, cascade='all, delete-orphan')
 
-    def to_dict(self):
+    def to_dict(self, company_count=None):
+        if company_count is None:
+            company_count = db.session.query(func.count(Company.id)).filter_by(project_id=self.id).scalar()
         return {
             'id': self.id,
             'name': self.name,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'company_count': len(self.companies)
+            'created_at': self.created_at,
+            'company_count': company_count
         }
 
 class Company(db.Model):
+    __table_args__ = (db.Index('ix_company_project', 'project_id'),)
+    
     id = db.Column(db.Integer, primary_key=True)
     project_id = db.Column(db.Integer, db.ForeignKey('project.id'), nullable=False)
     name = db.Column(db.String(200), nullable=False)
     position = db.Column(db.String(200), nullable=False)
     link = db.Column(db.String(500))
-    stages = db.relationship('Stage', backref='company', lazy=True, cascade='all, delete-orphan')
+    project = db.relationship('Project', back_populates='companies')
+    stages = db.relationship('Stage', back_populates='company', lazy=True, cascade='all, delete-orphan',
+                             order_by='[Stage.order, Stage.id]')
 
     def to_dict(self):
         return {
@@ -50,33 +92,107 @@ class Company(db.Model):
         }
 
 class Stage(db.Model):
+    __table_args__ = (db.Index('ix_stage_company_order', 'company_id', 'order'),)
+    
     id = db.Column(db.Integer, primary_key=True)
     company_id = db.Column(db.Integer, db.ForeignKey('company.id'), nullable=False)
     stage_name = db.Column(db.String(100), nullable=False)
     date = db.Column(db.Date)
     description = db.Column(db.Text)
     order = db.Column(db.Integer, default=0)
+    company = db.relationship('Company', back_populates='stages')
 
     def to_dict(self):
         return {
             'id': self.id,
             'company_id': self.company_id,
             'stage_name': self.stage_name,
-            'date': self.date.isoformat() if self.date else None,
+            'date': self.date,
             'description': self.description,
             'order': self.order
         }
 
+# SQLite tuning, applied once per new DBAPI connection
+SQLITE_PRAGMAS = (
+    'journal_mode=WAL',
+    'synchronous=NORMAL',
+    'temp_store=MEMORY',
+    'cache_size=-65536',
+    'mmap_size=268435456',
+    'foreign_keys=ON',
+)
+
+def _set_sqlite_pragmas(dbapi_conn, connection_record):
+    cursor = dbapi_conn.cursor()
+    for pragma in SQLITE_PRAGMAS:
+        cursor.execute(f'PRAGMA {pragma}')
+    cursor.close()
+
 # Create tables
 with app.app_context():
+    if db.engine.dialect.name == 'sqlite':
+        event.listen(db.engine, 'connect', _set_sqlite_pragmas)
     db.create_all()
+    # create_all skips existing tables, so add indexes missing from older databases
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)
+
+# Date parsing shared by the stage API and CSV import
+DATE_FORMATS = ('%B %d, %Y',)
+
+def _parse_known_date(value):
+    """Parse an ISO date or one of DATE_FORMATS, returning None if it is neither"""
+    try:
+        # Fast path for the YYYY-MM-DD dates the frontend and exports use
+        return date.fromisoformat(value)
+    except ValueError:
+        pass
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            pass
+    return None
+
+def _parse_api_date(value):
+    """Parse a stage date sent to the API; None or '' clear it, anything unrecognised raises ValueError"""
+    if value is None or value == '':
+        return None
+    if not isinstance(value, str):
+        raise ValueError(f'Invalid date: {value!r}')
+    parsed = _parse_known_date(value.strip())
+    if parsed is None:
+        raise ValueError(f'Invalid date: {value!r}')
+    return parsed
+
+def _parse_date(value):
+    """Parse a CSV date cell, returning None for empty or unparseable values"""
+    if not value or not value.strip():
+        return None
+    value = value.strip()
+    return _parse_known_date(value) or _parse_date_fallback(value)
+
+@lru_cache(maxsize=4096)
+def _parse_date_fallback(value):
+    # Free-form dates are only guessed at on import; the API accepts known formats only
+    try:
+        return date_parser.parse(value).date()
+    except (ValueError, OverflowError):
+        return None
 
 # Routes for Projects
 @app.route('/api/projects', methods=['GET', 'POST'])
 def handle_projects():
     if request.method == 'GET':
         projects = Project.query.all()
-        return jsonify([p.to_dict() for p in projects])
+        # Count companies for every project in a single GROUP BY query
+        counts = dict(
+            db.session.query(Company.project_id, func.count(Company.id))
+            .group_by(Company.project_id)
+            .all()
+        )
+        return jsonify([p.to_dict(company_count=counts.get(p.id, 0)) for p in projects])
     
     elif request.method == 'POST':
         data = request.json
@@ -107,10 +223,31 @@ def handle_project(project_id):
 @app.route('/api/projects/<int:project_id>/companies', methods=['GET', 'POST'])
 def handle_companies(project_id):
     if request.method == 'GET':
-        companies = Company.query.filter_by(project_id=project_id).all()
-        return jsonify([c.to_dict() for c in companies])
+        # Read-only: skip the autoflush check on each query
+        with db.session.no_autoflush:
+            # Plain column rows instead of ORM objects; the endpoint only needs JSON
+            companies = [
+                dict(row, stages=[])
+                for row in db.session.execute(
+                    select(Company.id, Company.project_id, Company.name, Company.position, Company.link)
+                    .where(Company.project_id == project_id)
+                    .order_by(Company.id)
+                ).mappings()
+            ]
+            stages_by_company = defaultdict(list)
+            for row in db.session.execute(
+                select(Stage.id, Stage.company_id, Stage.stage_name, Stage.date, Stage.description, Stage.order)
+                .join(Company)
+                .where(Company.project_id == project_id)
+                .order_by(Stage.company_id, Stage.order, Stage.id)
+            ).mappings():
+                stages_by_company[row['company_id']].append(dict(row))
+            for company in companies:
+                company['stages'] = stages_by_company[company['id']]
+            return jsonify(companies)
     
     elif request.method == 'POST':
+        Project.query.get_or_404(project_id)
         data = request.json
         company = Company(
             project_id=project_id,
@@ -150,11 +287,16 @@ def handle_stages(company_id):
         return jsonify([s.to_dict() for s in stages])
     
     elif request.method == 'POST':
+        Company.query.get_or_404(company_id)
         data = request.json
+        try:
+            stage_date = _parse_api_date(data.get('date'))
+        except ValueError:
+            return jsonify({'error': 'Invalid date'}), 400
         stage = Stage(
             company_id=company_id,
             stage_name=data['stage_name'],
-            date=datetime.fromisoformat(data['date']) if data.get('date') else None,
+            date=stage_date,
             description=data.get('description'),
             order=data.get('order', 0)
         )
@@ -171,9 +313,13 @@ def handle_stage(stage_id):
     
     elif request.method == 'PUT':
         data = request.json
-        stage.stage_name = data.get('stage_name', stage.stage_name)
         if 'date' in data:
-            stage.date = datetime.fromisoformat(data['date']) if data['date'] else None
+            try:
+                stage_date = _parse_api_date(data['date'])
+            except ValueError:
+                return jsonify({'error': 'Invalid date'}), 400
+            stage.date = stage_date
+        stage.stage_name = data.get('stage_name', stage.stage_name)
         stage.description = data.get('description', stage.description)
         stage.order = data.get('order', stage.order)
         db.session.commit()
@@ -185,66 +331,101 @@ def handle_stage(stage_id):
         return '', 204
 
 # Import/Export routes
+# Columns holding company fields; any other column in a multi-stage CSV is a stage
+COMPANY_COLUMNS = ('Company', 'Position', 'Link')
+# Cell values pandas.read_csv treats as missing by default; the importer used pandas
+# before it streamed with csv, so these still count as empty link and stage cells
+CSV_NA_VALUES = frozenset({
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null',
+})
+IMPORT_CHUNK_SIZE = 10000
+EXPORT_BATCH_SIZE = 500
+
+def _csv_cell(row, column):
+    """Stripped cell value, or '' when the cell is missing or one of CSV_NA_VALUES"""
+    value = (row.get(column) or '').strip()
+    return '' if value in CSV_NA_VALUES else value
+
+def insert_companies_with_stages(company_rows, company_stages):
+    """Bulk insert companies and their stages, company_stages[i] belonging to company_rows[i]"""
+    if not company_rows:
+        return
+    # One multi-row INSERT ... RETURNING, ids come back in row order
+    company_ids = db.session.scalars(
+        insert(Company).returning(Company.id, sort_by_parameter_order=True),
+        company_rows
+    ).all()
+    stage_rows = [
+        dict(stage, company_id=company_id)
+        for company_id, stages in zip(company_ids, company_stages)
+        for stage in stages
+    ]
+    if stage_rows:
+        db.session.execute(insert(Stage), stage_rows)
+
 @app.route('/api/projects/<int:project_id>/import', methods=['POST'])
 def import_csv(project_id):
     project = Project.query.get_or_404(project_id)
     
-    if 'file' not in request.files:
+    file = request.files.get('file')
+    if file is None:
         return jsonify({'error': 'No file provided'}), 400
-    
-    file = request.files['file']
-    if file.filename == '':
+    if not file.filename:
         return jsonify({'error': 'No file selected'}), 400
     
     try:
-        # Read CSV
-        content = file.read().decode('utf-8')
-        df = pd.read_csv(StringIO(content))
+        # Stream rows straight from the upload instead of loading the whole file.
+        # iterdecode rather than TextIOWrapper: before Python 3.11 the SpooledTemporaryFile
+        # Werkzeug stores uploads in is not an io.IOBase and cannot be wrapped
+        reader = csv.DictReader(codecs.iterdecode(file.stream, 'utf-8-sig'))
+        fieldnames = reader.fieldnames or []
         
-        # Process each row
-        for _, row in df.iterrows():
-            # Create company
-            company = Company(
-                project_id=project_id,
-                name=row.get('Company', ''),
-                position=row.get('Position', ''),
-                link=row.get('Link', '')
-            )
-            db.session.add(company)
-            db.session.flush()
+        # Check if it's a single stage format (like example_import.csv)
+        single_stage = 'Stage' in fieldnames and 'Date' in fieldnames
+        stage_columns = [] if single_stage else [col for col in fieldnames if col not in COMPANY_COLUMNS]
+        
+        # Collect company and stage rows, inserting them in bulk chunks
+        company_rows = []
+        company_stages = []
+        for row in reader:
+            if len(company_rows) >= IMPORT_CHUNK_SIZE:
+                insert_companies_with_stages(company_rows, company_stages)
+                company_rows.clear()
+                company_stages.clear()
             
-            # Handle stages
-            stage_columns = [col for col in df.columns if col not in ['Company', 'Position', 'Link']]
+            company_rows.append({
+                'project_id': project_id,
+                'name': row.get('Company') or '',
+                'position': row.get('Position') or '',
+                'link': _csv_cell(row, 'Link') or None
+            })
+            stages = []
             
-            # Check if it's a single stage format (like example_import.csv)
-            if 'Stage' in df.columns and 'Date' in df.columns:
+            # Handle stages
+            if single_stage:
                 # Single stage format
-                stage = Stage(
-                    company_id=company.id,
-                    stage_name=row.get('Stage', ''),
-                    date=pd.to_datetime(row.get('Date'), errors='coerce').date() if pd.notna(row.get('Date')) else None,
-                    order=0
-                )
-                db.session.add(stage)
+                stages.append({
+                    'stage_name': row.get('Stage') or '',
+                    'date': _parse_date(_csv_cell(row, 'Date')),
+                    'order': 0
+                })
             else:
                 # Multi-stage format
                 order = 0
                 for col in stage_columns:
-                    if pd.notna(row[col]):
-                        # Parse date from the cell value
-                        try:
-                            date = pd.to_datetime(row[col], errors='coerce').date()
-                        except:
-                            date = None
-                        
-                        stage = Stage(
-                            company_id=company.id,
-                            stage_name=col,
-                            date=date,
-                            order=order
-                        )
-                        db.session.add(stage)
+                    value = _csv_cell(row, col)
+                    if value:
+                        stages.append({
+                            'stage_name': col,
+                            # Parse date from the cell value
+                            'date': _parse_date(value),
+                            'order': order
+                        })
                         order += 1
+            company_stages.append(stages)
+        
+        insert_companies_with_stages(company_rows, company_stages)
         
         db.session.commit()
         return jsonify({'message': 'Import successful', 'project_id': project_id}), 200
@@ -253,39 +434,71 @@ def import_csv(project_id):
         db.session.rollback()
         return jsonify({'error': str(e)}), 400
 
+def _attachment_headers(download_name):
+    """Content-Disposition header for a download, quoted the way send_file does it"""
+    try:
+        download_name.encode('ascii')
+    except UnicodeEncodeError:
+        simple = unicodedata.normalize('NFKD', download_name).encode('ascii', 'ignore').decode('ascii')
+        names = {'filename': simple, 'filename*': f"UTF-8''{quote(download_name, safe='!#$&+^`|~')}"}
+    else:
+        names = {'filename': download_name}
+    headers = Headers()
+    headers.set('Content-Disposition', 'attachment', **names)
+    return headers
+
 @app.route('/api/projects/<int:project_id>/export', methods=['GET'])
 def export_csv(project_id):
     project = Project.query.get_or_404(project_id)
-    companies = Company.query.filter_by(project_id=project_id).all()
+    # Load companies in batches while streaming rather than all up front
+    companies_query = (
+        select(Company)
+        .options(selectinload(Company.stages))
+        .where(Company.project_id == project_id)
+        .order_by(Company.id)
+        .execution_options(yield_per=EXPORT_BATCH_SIZE)
+    )
     
-    # Prepare data for export
-    data = []
-    for company in companies:
-        row = {
-            'Company': company.name,
-            'Position': company.position,
-            'Link': company.link
-        }
+    # Stage columns in order of first appearance, as the export has always listed them
+    stage_names = db.session.scalars(
+        select(Stage.stage_name)
+        .join(Company)
+        .where(Company.project_id == project_id)
+        .order_by(Stage.company_id, Stage.order, Stage.id)
+    )
+    stage_columns = list(dict.fromkeys(stage_names))
+    
+    def generate():
+        buffer = StringIO()
+        writer = csv.writer(buffer, lineterminator='\n')
         
-        # Add stages
-        for stage in sorted(company.stages, key=lambda s: s.order):
-            row[stage.stage_name] = stage.date.isoformat() if stage.date else ''
+        def flush():
+            chunk = buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            return chunk
         
-        data.append(row)
-    
-    # Create DataFrame
-    df = pd.DataFrame(data)
-    
-    # Export to CSV
-    output = BytesIO()
-    df.to_csv(output, index=False, encoding='utf-8')
-    output.seek(0)
+        writer.writerow(list(COMPANY_COLUMNS) + stage_columns)
+        yield flush()
+        
+        # Read-only: the per-batch company and stage loads never need to flush
+        with db.session.no_autoflush:
+            for company in db.session.scalars(companies_query):
+                # Add stages
+                stage_dates = {}
+                for stage in company.stages:
+                    stage_dates[stage.stage_name] = stage.date.isoformat() if stage.date else ''
+                
+                writer.writerow(
+                    [company.name, company.position, company.link]
+                    + [stage_dates.get(col, '') for col in stage_columns]
+                )
+                yield flush()
     
-    return send_file(
-        output,
+    return Response(
+        stream_with_context(generate()),
         mimetype='text/csv',
-        as_attachment=True,
-        download_name=f'{project.name}_export.csv'
+        headers=_attachment_headers(f'{project.name}_export.csv')
     )
 
 if __name__ == '__main__':
@@ -1,11 +1,17 @@
+import argparse
 import os
-import sys
 import pandas as pd
-from datetime import datetime
-from app import app, db, Project, Company, Stage
+from app import app, db, Project, COMPANY_COLUMNS, insert_companies_with_stages
 
-def import_initial_data():
-    """Import example_import.csv as the first project"""
+DEFAULT_CSV_PATH = os.path.join(os.path.dirname(__file__), '..', 'example_import.csv')
+
+def _parse_date_column(column, format):
+    """Parse a CSV column to a list of dates, with None for empty or unparseable cells"""
+    parsed = pd.to_datetime(column, errors='coerce', format=format, cache=True)
+    return parsed.dt.date.astype(object).where(parsed.notna(), None).tolist()
+
+def import_initial_data(csv_path=None):
+    """Import a CSV (example_import.csv by default) as the first project"""
     with app.app_context():
         # Check if we already have data
         if Project.query.count() > 0:
@@ -15,63 +21,64 @@ def import_initial_data():
         # Create first project
         project = Project(name="Job Applications 2025")
         db.session.add(project)
-        db.session.commit()
+        db.session.flush()
         
         # Read the CSV file
-        csv_path = os.path.join(os.path.dirname(__file__), '..', 'example_import.csv')
-        df = pd.read_csv(csv_path)
+        df = pd.read_csv(csv_path or DEFAULT_CSV_PATH)
         
-        # Import each row
-        for _, row in df.iterrows():
-            # Create company
-            company = Company(
-                project_id=project.id,
-                name=row['Company'],
-                position=row['Position'],
-                link=row['Link'] if pd.notna(row['Link']) else None
-            )
-            db.session.add(company)
-            db.session.flush()
+        # Parse every date column in one vectorized call instead of cell by cell
+        single_stage = 'Stage' in df.columns and 'Date' in df.columns
+        if single_stage:
+            single_dates = _parse_date_column(df['Date'], format='%B %d, %Y')
+        else:
+            stage_columns = [col for col in df.columns if col not in COMPANY_COLUMNS]
+            stage_dates = [_parse_date_column(df[col], format='mixed') for col in stage_columns]
+            # Which stage cells are filled in, as one boolean array lookup per cell
+            stage_present = df[stage_columns].notna().to_numpy()
+        links = df['Link'].astype(object).where(df['Link'].notna(), None).tolist()
+        
+        # Collect company and stage rows, then insert them in bulk
+        company_rows = []
+        company_stages = []
+        for i, (_, row) in enumerate(df.iterrows()):
+            company_rows.append({
+                'project_id': project.id,
+                'name': row['Company'],
+                'position': row['Position'],
+                'link': links[i]
+            })
+            stages = []
             
             # Handle stages - check if it's single stage format (old) or multi-stage format (new)
-            if 'Stage' in df.columns and 'Date' in df.columns:
+            if single_stage:
                 # Old single stage format
-                try:
-                    date = pd.to_datetime(row['Date'], format='%B %d, %Y').date()
-                except:
-                    date = None
-                
-                stage = Stage(
-                    company_id=company.id,
-                    stage_name=row['Stage'],
-                    date=date,
-                    order=0  # Single stage, so order is 0
-                )
-                db.session.add(stage)
+                stages.append({
+                    'stage_name': row['Stage'],
+                    'date': single_dates[i],
+                    'order': 0  # Single stage, so order is 0
+                })
             else:
                 # New multi-stage format
-                stage_columns = [col for col in df.columns if col not in ['Company', 'Position', 'Link']]
                 order = 0
                 
-                for col in stage_columns:
-                    if pd.notna(row[col]):
-                        # Parse date from the cell value
-                        try:
-                            date = pd.to_datetime(row[col], errors='coerce').date()
-                        except:
-                            date = None
-                        
-                        stage = Stage(
-                            company_id=company.id,
-                            stage_name=col,
-                            date=date,
-                            order=order
-                        )
-                        db.session.add(stage)
+                for j, col in enumerate(stage_columns):
+                    if stage_present[i, j]:
+                        stages.append({
+                            'stage_name': col,
+                            'date': stage_dates[j][i],
+                            'order': order
+                        })
                         order += 1
+            company_stages.append(stages)
+        
+        insert_companies_with_stages(company_rows, company_stages)
         
+        # Project, companies and stages land in a single transaction
         db.session.commit()
         print(f"Successfully imported {len(df)} companies into project '{project.name}'")
 
 if __name__ == '__main__':
-    import_initial_data()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Import a CSV as the first project')
+    parser.add_argument('csv_path', nargs='?', default=DEFAULT_CSV_PATH,
+                        help='CSV file to import (default: example_import.csv)')
+    import_initial_data(parser.parse_args().csv_path)
\ No newline at end of file
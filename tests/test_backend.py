@@ -1,5 +1,6 @@
 import sys
 import os
+import io
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'backend')))
 
 import pytest
@@ -36,6 +37,23 @@ def test_get_projects(client):
     data = response.get_json()
     assert len(data) == 2
 
+def test_get_projects_company_count(client):
+    """Test that the project list reports company counts"""
+    project_response = client.post('/api/projects', json={'name': 'Counted Project'})
+    project_id = project_response.get_json()['id']
+    empty_response = client.post('/api/projects', json={'name': 'Empty Project'})
+    empty_id = empty_response.get_json()['id']
+    
+    for name in ['First Co', 'Second Co']:
+        client.post(f'/api/projects/{project_id}/companies',
+                   json={'name': name, 'position': 'Engineer'})
+    
+    response = client.get('/api/projects')
+    assert response.status_code == 200
+    counts = {p['id']: p['company_count'] for p in response.get_json()}
+    assert counts[project_id] == 2
+    assert counts[empty_id] == 0
+
 def test_create_company(client):
     """Test creating a company"""
     # Create a project first
@@ -54,6 +72,25 @@ def test_create_company(client):
     assert data['name'] == 'Test Company'
     assert data['position'] == 'Software Engineer'
 
+def test_create_with_missing_parent(client):
+    """Test that creating a company or stage under a missing parent returns 404"""
+    project_response = client.post('/api/projects', json={'name': 'Test Project'})
+    project_id = project_response.get_json()['id']
+    
+    company_response = client.post(f'/api/projects/{project_id}/companies',
+                                 json={'name': 'Test Company', 'position': 'Engineer'})
+    company_id = company_response.get_json()['id']
+    
+    # Delete the parents so their ids are known not to exist
+    client.delete(f'/api/companies/{company_id}')
+    response = client.post(f'/api/companies/{company_id}/stages', json={'stage_name': 'Applied'})
+    assert response.status_code == 404
+    
+    client.delete(f'/api/projects/{project_id}')
+    response = client.post(f'/api/projects/{project_id}/companies',
+                          json={'name': 'Orphan Co', 'position': 'Engineer'})
+    assert response.status_code == 404
+
 def test_create_stage(client):
     """Test creating a stage"""
     # Create project and company first
@@ -75,6 +112,74 @@ def test_create_stage(client):
     data = response.get_json()
     assert data['stage_name'] == 'Applied'
 
+def test_stage_date_formats(client):
+    """Test that stage dates accept ISO and long-form dates"""
+    project_response = client.post('/api/projects', json={'name': 'Test Project'})
+    project_id = project_response.get_json()['id']
+    
+    company_response = client.post(f'/api/projects/{project_id}/companies',
+                                 json={'name': 'Test Company', 'position': 'Engineer'})
+    company_id = company_response.get_json()['id']
+    
+    response = client.post(f'/api/companies/{company_id}/stages',
+                          json={'stage_name': 'Applied', 'date': 'January 15, 2025'})
+    assert response.status_code == 201
+    stage = response.get_json()
+    assert stage['date'] == '2025-01-15'
+    
+    response = client.put(f'/api/stages/{stage["id"]}', json={'date': '2025-02-01'})
+    assert response.get_json()['date'] == '2025-02-01'
+    
+    response = client.put(f'/api/stages/{stage["id"]}', json={'date': None})
+    assert response.get_json()['date'] is None
+
+def test_stage_invalid_date_rejected(client):
+    """Test that an unparseable stage date is rejected instead of dropped"""
+    project_response = client.post('/api/projects', json={'name': 'Test Project'})
+    project_id = project_response.get_json()['id']
+    
+    company_response = client.post(f'/api/projects/{project_id}/companies',
+                                 json={'name': 'Test Company', 'position': 'Engineer'})
+    company_id = company_response.get_json()['id']
+    
+    response = client.post(f'/api/companies/{company_id}/stages',
+                          json={'stage_name': 'Applied', 'date': 'not a date'})
+    assert response.status_code == 400
+    assert client.get(f'/api/companies/{company_id}/stages').get_json() == []
+    
+    stage = client.post(f'/api/companies/{company_id}/stages',
+                       json={'stage_name': 'Applied', 'date': '2025-01-15'}).get_json()
+    response = client.put(f'/api/stages/{stage["id"]}', json={'date': 'not a date'})
+    assert response.status_code == 400
+    
+    # Partial or non-string dates are not guessed at
+    for bad_date in ['Monday', '5', 'March', 20250115]:
+        response = client.post(f'/api/companies/{company_id}/stages',
+                              json={'stage_name': 'Interview', 'date': bad_date})
+        assert response.status_code == 400
+        response = client.put(f'/api/stages/{stage["id"]}', json={'date': bad_date})
+        assert response.status_code == 400
+    assert len(client.get(f'/api/companies/{company_id}/stages').get_json()) == 1
+    assert client.get(f'/api/stages/{stage["id"]}').get_json()['date'] == '2025-01-15'
+
+def test_company_stages_ordered(client):
+    """Test that a company's stages come back sorted by their order"""
+    project_response = client.post('/api/projects', json={'name': 'Test Project'})
+    project_id = project_response.get_json()['id']
+    
+    company_response = client.post(f'/api/projects/{project_id}/companies',
+                                 json={'name': 'Test Company', 'position': 'Engineer'})
+    company_id = company_response.get_json()['id']
+    
+    for name, order in [('Offer', 2), ('Applied', 0), ('Interview', 1)]:
+        client.post(f'/api/companies/{company_id}/stages',
+                   json={'stage_name': name, 'order': order})
+    
+    response = client.get(f'/api/companies/{company_id}')
+    assert response.status_code == 200
+    stages = response.get_json()['stages']
+    assert [s['stage_name'] for s in stages] == ['Applied', 'Interview', 'Offer']
+
 def test_update_project(client):
     """Test updating a project"""
     # Create a project
@@ -126,6 +231,101 @@ Rejected,OtherCo,Developer,https://other.com,2025-01-20"""
     companies = companies_response.get_json()
     assert len(companies) == 2
 
+def test_import_csv_single_stage_stream(client):
+    """Test importing CSV with Stage and Date columns from an uploaded stream"""
+    project_response = client.post('/api/projects', json={'name': 'Single Stage Import'})
+    project_id = project_response.get_json()['id']
+    
+    csv_content = """Stage,Company,Position,Link,Date
+Applied,TestCo,Engineer,https://test.com,2025-01-15
+Rejected,OtherCo,Developer,,"""
+    
+    data = {
+        'file': (io.BytesIO(csv_content.encode()), 'test.csv')
+    }
+    
+    response = client.post(f'/api/projects/{project_id}/import',
+                         data=data, content_type='multipart/form-data')
+    assert response.status_code == 200
+    
+    companies = client.get(f'/api/projects/{project_id}/companies').get_json()
+    assert [c['name'] for c in companies] == ['TestCo', 'OtherCo']
+    assert companies[1]['link'] is None
+    assert [(s['stage_name'], s['date'], s['order']) for s in companies[0]['stages']] == [
+        ('Applied', '2025-01-15', 0)
+    ]
+    assert [(s['stage_name'], s['date']) for s in companies[1]['stages']] == [('Rejected', None)]
+
+def test_import_csv_multi_stage(client):
+    """Test importing CSV with one column per stage"""
+    # Create a project
+    project_response = client.post('/api/projects', json={'name': 'Multi Stage Import'})
+    project_id = project_response.get_json()['id']
+    
+    # Create CSV content
+    csv_content = """Company,Position,Link,Applied,First Interview,Rejected
+TestCo,Engineer,https://test.com,2025-01-15,2025-01-20,
+OtherCo,Developer,,2025-01-16,,2025-01-25"""
+    
+    data = {
+        'file': (io.BytesIO(csv_content.encode()), 'test.csv')
+    }
+    
+    response = client.post(f'/api/projects/{project_id}/import',
+                         data=data, content_type='multipart/form-data')
+    assert response.status_code == 200
+    
+    # Verify companies and their stages were created in order
+    companies_response = client.get(f'/api/projects/{project_id}/companies')
+    companies = companies_response.get_json()
+    assert [c['name'] for c in companies] == ['TestCo', 'OtherCo']
+    assert [s['stage_name'] for s in companies[0]['stages']] == ['Applied', 'First Interview']
+    assert [s['stage_name'] for s in companies[1]['stages']] == ['Applied', 'Rejected']
+    assert companies[1]['stages'][1]['date'] == '2025-01-25'
+    assert companies[1]['stages'][1]['order'] == 1
+
+def test_import_csv_na_cells(client):
+    """Test that NA markers in link and stage cells are treated as empty"""
+    project_response = client.post('/api/projects', json={'name': 'NA Import'})
+    project_id = project_response.get_json()['id']
+    
+    csv_content = """Company,Position,Link,Applied,First Interview,Rejected
+TestCo,Engineer,N/A,2025-01-15,NA,null"""
+    
+    data = {
+        'file': (io.BytesIO(csv_content.encode()), 'test.csv')
+    }
+    
+    response = client.post(f'/api/projects/{project_id}/import',
+                         data=data, content_type='multipart/form-data')
+    assert response.status_code == 200
+    
+    companies = client.get(f'/api/projects/{project_id}/companies').get_json()
+    assert companies[0]['link'] is None
+    assert [s['stage_name'] for s in companies[0]['stages']] == ['Applied']
+
+def test_import_csv_in_chunks(client, monkeypatch):
+    """Test that imports larger than one chunk keep companies and stages paired"""
+    monkeypatch.setattr('app.IMPORT_CHUNK_SIZE', 2)
+    
+    project_response = client.post('/api/projects', json={'name': 'Chunked Import'})
+    project_id = project_response.get_json()['id']
+    
+    lines = ['Company,Position,Link,Applied,Rejected']
+    lines += [f'Co{i},Engineer,,2025-01-{i + 10},2025-02-{i + 10}' for i in range(5)]
+    data = {
+        'file': (io.BytesIO('\n'.join(lines).encode()), 'test.csv')
+    }
+    
+    response = client.post(f'/api/projects/{project_id}/import',
+                         data=data, content_type='multipart/form-data')
+    assert response.status_code == 200
+    
+    companies = client.get(f'/api/projects/{project_id}/companies').get_json()
+    assert [c['name'] for c in companies] == [f'Co{i}' for i in range(5)]
+    for i, company in enumerate(companies):
+        assert [s['date'] for s in company['stages']] == [f'2025-01-{i + 10}', f'2025-02-{i + 10}']
+
 def test_export_csv(client):
     """Test exporting project data as CSV"""
     # Create project with data
@@ -146,5 +346,50 @@ def test_export_csv(client):
     assert response.status_code == 200
     assert response.content_type == 'text/csv; charset=utf-8'
 
+def test_export_csv_content(client):
+    """Test that the export has one column per stage in first-seen order"""
+    project_response = client.post('/api/projects', json={'name': 'Export Content'})
+    project_id = project_response.get_json()['id']
+    
+    first_id = client.post(f'/api/projects/{project_id}/companies',
+                          json={'name': 'FirstCo', 'position': 'Engineer'}).get_json()['id']
+    second_id = client.post(f'/api/projects/{project_id}/companies',
+                           json={'name': 'Second, Co', 'position': 'Developer',
+                                 'link': 'https://second.com'}).get_json()['id']
+    
+    client.post(f'/api/companies/{first_id}/stages',
+               json={'stage_name': 'Applied', 'date': '2025-01-15', 'order': 0})
+    client.post(f'/api/companies/{second_id}/stages',
+               json={'stage_name': 'Applied', 'date': '2025-01-16', 'order': 0})
+    client.post(f'/api/companies/{second_id}/stages',
+               json={'stage_name': 'Rejected', 'date': '2025-01-30', 'order': 1})
+    
+    response = client.get(f'/api/projects/{project_id}/export')
+    assert response.status_code == 200
+    assert 'Export Content_export.csv' in response.headers['Content-Disposition']
+    assert response.get_data(as_text=True).splitlines() == [
+        'Company,Position,Link,Applied,Rejected',
+        'FirstCo,Engineer,,2025-01-15,',
+        '"Second, Co",Developer,https://second.com,2025-01-16,2025-01-30',
+    ]
+
+def test_export_csv_in_batches(client, monkeypatch):
+    """Test that exports spanning several load batches include every company"""
+    monkeypatch.setattr('app.EXPORT_BATCH_SIZE', 2)
+    
+    project_response = client.post('/api/projects', json={'name': 'Batched Export'})
+    project_id = project_response.get_json()['id']
+    
+    for i in range(5):
+        company_id = client.post(f'/api/projects/{project_id}/companies',
+                                json={'name': f'Co{i}', 'position': 'Engineer'}).get_json()['id']
+        client.post(f'/api/companies/{company_id}/stages',
+                   json={'stage_name': 'Applied', 'date': f'2025-01-{i + 10}'})
+    
+    response = client.get(f'/api/projects/{project_id}/export')
+    assert response.status_code == 200
+    lines = response.get_data(as_text=True).splitlines()
+    assert lines[1:] == [f'Co{i},Engineer,,2025-01-{i + 10}' for i in range(5)]
+
 if __name__ == '__main__':
     pytest.main([__file__])
\ No newline at end of file